@@ -1,5 +1,6 @@
 from .discovery import *
 from .exceptions import *
+from .http_client import *
 from .jwks import *
 from .token_client import *
 from .token_validation import *
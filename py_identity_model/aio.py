@@ -0,0 +1,61 @@
+import asyncio
+from typing import Optional
+
+from .discovery import (
+    DiscoveryDocumentRequest,
+    DiscoveryDocumentResponse,
+    get_discovery_document as _get_discovery_document,
+)
+from .jwks import JwksRequest, JwksResponse, get_jwks as _get_jwks
+from .token_client import (
+    ClientCredentialsTokenRequest,
+    ClientCredentialsTokenResponse,
+    request_client_credentials_token as _request_client_credentials_token,
+)
+from .token_validation import (
+    TokenValidationConfig,
+    validate_token as _validate_token,
+)
+
+# The synchronous implementations are run on the default executor so that
+# network round trips and signature verification never block the event loop.
+# Their caches are thread safe and shared with synchronous callers.
+
+
+async def get_discovery_document(
+    disco_doc_req: DiscoveryDocumentRequest,
+) -> DiscoveryDocumentResponse:
+    return await asyncio.to_thread(_get_discovery_document, disco_doc_req)
+
+
+async def get_jwks(jwks_request: JwksRequest) -> JwksResponse:
+    return await asyncio.to_thread(_get_jwks, jwks_request)
+
+
+async def request_client_credentials_token(
+    request: ClientCredentialsTokenRequest,
+) -> ClientCredentialsTokenResponse:
+    return await asyncio.to_thread(_request_client_credentials_token, request)
+
+
+async def validate_token(
+    jwt: str,
+    token_validation_config: TokenValidationConfig,
+    disco_doc_address: Optional[str] = None,
+    jwks_uri_hint: Optional[str] = None,
+) -> dict:
+    return await asyncio.to_thread(
+        _validate_token,
+        jwt,
+        token_validation_config,
+        disco_doc_address,
+        jwks_uri_hint,
+    )
+
+
+__all__ = [
+    "get_discovery_document",
+    "get_jwks",
+    "request_client_credentials_token",
+    "validate_token",
+]
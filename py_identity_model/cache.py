@@ -0,0 +1,244 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Hashable, Mapping, Optional
+
+_MAX_AGE_PATTERN = re.compile(r"max-age\s*=\s*\"?(\d+)\"?", re.IGNORECASE)
+
+
+class TTLCache:
+    """Thread safe, size bounded cache whose entries expire after a TTL"""
+
+    def __init__(self, maxsize: int = 128):
+        self.maxsize = maxsize
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return default
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: float) -> None:
+        with self._lock:
+            self._set(key, value, ttl)
+
+    def _set(self, key: Hashable, value: Any, ttl: float) -> None:
+        # Callers must hold the lock
+        if ttl <= 0:
+            return
+
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def add(self, key: Hashable, value: Any, ttl: float) -> bool:
+        """Stores the value only if the key has no live entry.
+
+        The check and the insert happen under one lock, so exactly one of
+        several concurrent callers gets True.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                return False
+
+            self._set(key, value, ttl)
+            return True
+
+    def pop(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def get_max_age(headers: Mapping[str, str]) -> Optional[int]:
+    """Returns the freshness lifetime advertised by a Cache-Control header.
+
+    ``no-store`` and ``no-cache`` yield 0. None is returned when the header
+    is absent or does not specify a max-age, so callers can apply their own
+    default.
+    """
+    cache_control = headers.get("Cache-Control")
+    if not cache_control:
+        return None
+
+    directives = cache_control.lower()
+    if "no-store" in directives or "no-cache" in directives:
+        return 0
+
+    match = _MAX_AGE_PATTERN.search(cache_control)
+    if match:
+        return int(match.group(1))
+
+    return None
+
+
+@dataclass(slots=True, frozen=True)
+class _CachedResponse:
+    value: Any
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+
+class HttpResponseCache:
+    """Caches values parsed from HTTP responses.
+
+    Entries are fresh for the response's Cache-Control max-age (never less
+    than ``min_ttl``, falling back to ``default_ttl``). Once an entry goes
+    stale it is kept for ``stale_ttl`` seconds more so that it can be
+    revalidated with a conditional request, or served when a refresh fails.
+
+    With ``refresh_ahead`` set, an entry becomes due for a background
+    refresh once that fraction of its lifetime has passed (see
+    ``claim_refresh``).
+    """
+
+    def __init__(
+        self,
+        default_ttl: float,
+        min_ttl: float = 0,
+        stale_ttl: float = 86400,
+        stale_if_error_ttl: float = 60,
+        refresh_ahead: Optional[float] = None,
+        maxsize: int = 128,
+    ):
+        self.default_ttl = default_ttl
+        self.min_ttl = min_ttl
+        self.stale_ttl = stale_ttl
+        self.stale_if_error_ttl = stale_if_error_ttl
+        self.refresh_ahead = refresh_ahead
+        self._fresh = TTLCache(maxsize)
+        self._stale = TTLCache(maxsize)
+        self._refresh_at = TTLCache(maxsize)
+        self._refresh_lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Any:
+        return self._fresh.get(key)
+
+    def get_conditional_headers(self, key: Hashable) -> dict:
+        cached = self._stale.get(key)
+        headers = {}
+        if cached is not None:
+            if cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+        return headers
+
+    def store(
+        self, key: Hashable, value: Any, headers: Mapping[str, str]
+    ) -> None:
+        max_age = get_max_age(headers)
+        if max_age is None:
+            max_age = self.default_ttl
+
+        cached = _CachedResponse(
+            value=value,
+            etag=headers.get("ETag"),
+            last_modified=headers.get("Last-Modified"),
+        )
+        ttl = max(max_age, self.min_ttl)
+        self._fresh.set(key, value, ttl)
+        # no-store responses must not outlive their floor, so they are never
+        # kept for revalidation or served after a failed refresh.
+        if "no-store" in (headers.get("Cache-Control") or "").lower():
+            self._stale.pop(key)
+        else:
+            self._stale.set(key, cached, self.stale_ttl)
+        if self.refresh_ahead is not None:
+            self._refresh_at.set(
+                key, time.monotonic() + ttl * self.refresh_ahead, ttl
+            )
+
+    def revalidate(
+        self, key: Hashable, headers: Mapping[str, str]
+    ) -> Optional[Any]:
+        """Refreshes a stale entry after a 304 Not Modified response"""
+        cached = self._stale.get(key)
+        if cached is None:
+            return None
+
+        # A 304 may omit the validators, in which case the stored ones
+        # still apply.
+        self.store(
+            key,
+            cached.value,
+            {
+                "Cache-Control": headers.get("Cache-Control"),
+                "ETag": headers.get("ETag") or cached.etag,
+                "Last-Modified": headers.get("Last-Modified")
+                or cached.last_modified,
+            },
+        )
+        return cached.value
+
+    def get_stale(self, key: Hashable) -> Optional[Any]:
+        """Returns the last known value after a failed refresh.
+
+        The value is briefly treated as fresh again so that an outage at
+        the provider does not turn every lookup into a failing request.
+        """
+        cached = self._stale.get(key)
+        if cached is None:
+            return None
+
+        self._fresh.set(key, cached.value, self.stale_if_error_ttl)
+        return cached.value
+
+    def peek(self, key: Hashable) -> Optional[Any]:
+        """Returns the last stored value, even if it is no longer fresh"""
+        cached = self._stale.get(key)
+        return cached.value if cached is not None else None
+
+    def claim_refresh(self, key: Hashable) -> bool:
+        """Returns True to exactly one caller once an entry is due a refresh.
+
+        Claiming pushes the next refresh back by ``stale_if_error_ttl``, so
+        a refresh that fails is retried at that interval rather than on
+        every lookup. The schedule itself is kept for ``stale_ttl``, so it
+        outlives the retry time. A successful refresh resets it via store.
+        """
+        with self._refresh_lock:
+            refresh_at = self._refresh_at.get(key)
+            now = time.monotonic()
+            if refresh_at is None or now < refresh_at:
+                return False
+
+            self._refresh_at.set(
+                key, now + self.stale_if_error_ttl, self.stale_ttl
+            )
+            return True
+
+    def invalidate(self, key: Hashable) -> None:
+        """Forces the next lookup to revalidate, keeping the stale entry"""
+        self._fresh.pop(key)
+
+    def clear(self) -> None:
+        self._fresh.clear()
+        self._stale.clear()
+        self._refresh_at.clear()
+
+    def __len__(self) -> int:
+        return len(self._fresh)
+
+
+__all__ = ["HttpResponseCache", "TTLCache", "get_max_age"]
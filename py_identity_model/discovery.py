@@ -1,16 +1,39 @@
-from dataclasses import dataclass
-from typing import Optional
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, fields
+from typing import List, Optional
 
-import requests
+from .cache import HttpResponseCache
+from .http_client import get_http_session
+from .serialization import loads
 
+# Discovery documents change on the order of days, so an hour is a safe
+# default when the provider does not send Cache-Control: max-age.
+_DEFAULT_DISCOVERY_CACHE_TTL = int(
+    os.environ.get("OIDC_DISCOVERY_CACHE_TTL", 3600)
+)
 
-@dataclass
+# Lower bound on the lifetime, so a provider sending Cache-Control: no-cache
+# or max-age=0 does not cost a round trip on every validation.
+_MIN_DISCOVERY_CACHE_TTL = 300
+
+# Upper bound on the threads used by get_discovery_documents, kept well below
+# the connection pool size so pooled connections are reused, not discarded.
+_MAX_CONCURRENT_DISCOVERY_REQUESTS = 10
+
+_disco_cache = HttpResponseCache(
+    default_ttl=_DEFAULT_DISCOVERY_CACHE_TTL,
+    min_ttl=_MIN_DISCOVERY_CACHE_TTL,
+)
+
+
+@dataclass(slots=True, frozen=True)
 class DiscoveryDocumentRequest:
     address: str
 
 
 # TODO: full disco doc support
-@dataclass
+@dataclass(slots=True, frozen=True)
 class DiscoveryDocumentResponse:
     is_successful: bool
     issuer: Optional[str] = None
@@ -20,27 +43,123 @@ class DiscoveryDocumentResponse:
     error: Optional[str] = None
 
 
+# Metadata keys mapped onto DiscoveryDocumentResponse, all of which the
+# provider is required to publish.
+_DISCO_FIELDS = frozenset(
+    field.name for field in fields(DiscoveryDocumentResponse)
+) - {"is_successful", "error"}
+
+
+def _fetch_discovery_document(
+    disco_doc_req: DiscoveryDocumentRequest,
+) -> DiscoveryDocumentResponse:
+    address = disco_doc_req.address
+    # The context manager hands the connection back to the pool as soon as
+    # the body has been consumed, on both the success and failure paths.
+    with get_http_session().get(
+        address, headers=_disco_cache.get_conditional_headers(address)
+    ) as response:
+        if response.status_code == 304:
+            disco_doc_response = _disco_cache.revalidate(
+                address, response.headers
+            )
+            if disco_doc_response is not None:
+                return disco_doc_response
+
+        # TODO: raise for status and handle exceptions
+        if (
+            response.ok
+            and response.status_code != 304
+            and "application/json" in response.headers.get("Content-Type", "")
+        ):
+            response_json = loads(response.content)
+            missing_fields = _DISCO_FIELDS - response_json.keys()
+            if missing_fields:
+                return DiscoveryDocumentResponse(
+                    is_successful=False,
+                    error=f"Discovery document is missing required fields: "
+                    f"{', '.join(sorted(missing_fields))}",
+                )
+
+            disco_doc_response = DiscoveryDocumentResponse(
+                **{key: response_json[key] for key in _DISCO_FIELDS},
+                is_successful=True,
+            )
+            _disco_cache.store(address, disco_doc_response, response.headers)
+            return disco_doc_response
+        else:
+            stale_response = _disco_cache.get_stale(address)
+            if stale_response is not None:
+                return stale_response
+
+            return DiscoveryDocumentResponse(
+                is_successful=False,
+                error=f"Discovery document request failed with status code: "
+                f"{response.status_code}. Response Content: {response.content}",
+            )
+
+
 def get_discovery_document(
     disco_doc_req: DiscoveryDocumentRequest,
 ) -> DiscoveryDocumentResponse:
-    response = requests.get(disco_doc_req.address)
-    # TODO: raise for status and handle exceptions
-    if response.ok and "application/json" in response.headers.get(
-        "Content-Type", ""
-    ):
-        response_json = response.json()
-        return DiscoveryDocumentResponse(
-            issuer=response_json["issuer"],
-            jwks_uri=response_json["jwks_uri"],
-            authorization_endpoint=response_json["authorization_endpoint"],
-            token_endpoint=response_json["token_endpoint"],
-            is_successful=True,
-        )
-    else:
+    cached = _disco_cache.get(disco_doc_req.address)
+    if cached is not None:
+        return cached
+
+    try:
+        disco_doc_response = _fetch_discovery_document(disco_doc_req)
+    except OSError:
+        # requests' exceptions derive from OSError; fall back to the last
+        # known document if there is one.
+        disco_doc_response = _disco_cache.get_stale(disco_doc_req.address)
+        if disco_doc_response is None:
+            raise
+    return disco_doc_response
+
+
+get_discovery_document.cache_clear = _disco_cache.clear
+
+
+def _is_discovery_document_cached(address: str) -> bool:
+    return _disco_cache.get(address) is not None
+
+
+def _get_last_known_discovery_document(
+    address: str,
+) -> Optional[DiscoveryDocumentResponse]:
+    # The most recently fetched document, even if it is no longer fresh
+    return _disco_cache.peek(address)
+
+
+def _get_discovery_document_or_error(
+    disco_doc_req: DiscoveryDocumentRequest,
+) -> DiscoveryDocumentResponse:
+    try:
+        return get_discovery_document(disco_doc_req)
+    except Exception as e:
         return DiscoveryDocumentResponse(
             is_successful=False,
-            error=f"Discovery document request failed with status code: "
-            f"{response.status_code}. Response Content: {response.content}",
+            error=f"Unhandled exception during discovery request: {e}",
+        )
+
+
+def get_discovery_documents(
+    disco_doc_reqs: List[DiscoveryDocumentRequest],
+) -> List[DiscoveryDocumentResponse]:
+    """Fetches several discovery documents concurrently.
+
+    Responses are returned in the same order as the requests. Useful for
+    warming the cache against multiple issuers at startup. An issuer that
+    cannot be reached yields an unsuccessful response rather than failing
+    the whole batch.
+    """
+    if not disco_doc_reqs:
+        return []
+
+    max_workers = min(len(disco_doc_reqs), _MAX_CONCURRENT_DISCOVERY_REQUESTS)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(
+            executor.map(_get_discovery_document_or_error, disco_doc_reqs)
         )
 
 
@@ -48,4 +167,5 @@ __all__ = [
     "DiscoveryDocumentRequest",
     "DiscoveryDocumentResponse",
     "get_discovery_document",
+    "get_discovery_documents",
 ]
@@ -0,0 +1,89 @@
+import atexit
+import threading
+from typing import TYPE_CHECKING, Optional
+
+# requests and urllib3 account for most of the package's import time, so
+# they are only imported once the first outbound request is made.
+if TYPE_CHECKING:
+    import requests
+
+# Number of distinct hosts to keep pools for, and the number of keep-alive
+# connections kept per host. Most applications talk to a single provider.
+_POOL_CONNECTIONS = 10
+_POOL_MAXSIZE = 50
+
+# Retries are handled by urllib3 inside the adapter, so a successful request
+# never passes through any retry bookkeeping. Only idempotent methods are
+# retried, which keeps token requests (POST) to a single attempt. The
+# retry policy is built once with the session; urllib3 checks every
+# response's status against the forcelist, hence the frozenset.
+_MAX_RETRIES = 3
+_BACKOFF_FACTOR = 0.5
+_RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# A provider's Retry-After is honoured up to this many seconds, so a 503
+# asking for an hour cannot stall validation or the JWKS refresh thread.
+_MAX_RETRY_AFTER = 5
+
+# (connect, read) timeout in seconds applied to requests that do not set one
+_DEFAULT_TIMEOUT = (5, 10)
+
+
+def _build_session() -> "requests.Session":
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    class _BoundedRetry(Retry):
+        def get_retry_after(self, response):
+            retry_after = super().get_retry_after(response)
+            if retry_after is None:
+                return None
+            return min(retry_after, _MAX_RETRY_AFTER)
+
+    class _TimeoutHTTPAdapter(HTTPAdapter):
+        def send(self, request, timeout=None, **kwargs):
+            if timeout is None:
+                timeout = _DEFAULT_TIMEOUT
+            return super().send(request, timeout=timeout, **kwargs)
+
+    session = requests.Session()
+    retry = _BoundedRetry(
+        total=_MAX_RETRIES,
+        backoff_factor=_BACKOFF_FACTOR,
+        status_forcelist=_RETRY_STATUSES,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = _TimeoutHTTPAdapter(
+        pool_connections=_POOL_CONNECTIONS,
+        pool_maxsize=_POOL_MAXSIZE,
+        max_retries=retry,
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    # Close pooled keep-alive connections cleanly rather than leaving them
+    # to be torn down by interpreter shutdown.
+    atexit.register(session.close)
+    return session
+
+
+_session: Optional["requests.Session"] = None
+_session_lock = threading.Lock()
+
+
+def get_http_session() -> "requests.Session":
+    """Returns the process wide session shared by all outbound requests.
+
+    Reusing one session keeps TCP and TLS connections to the provider alive
+    between discovery, JWKS and token requests.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+
+__all__ = ["get_http_session"]
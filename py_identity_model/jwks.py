@@ -1,15 +1,40 @@
-from dataclasses import dataclass
-from typing import List, Optional
+import os
+import sys
+import threading
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Mapping, Optional, Tuple
 
-import requests
+from .cache import HttpResponseCache
+from .http_client import get_http_session
+from .serialization import loads
 
+# Signing keys rotate far more often than discovery metadata, so JWKS use a
+# shorter default lifetime when the provider sends no Cache-Control max-age.
+_DEFAULT_JWKS_CACHE_TTL = int(os.environ.get("OIDC_JWKS_CACHE_TTL", 300))
 
-@dataclass
+# Lower bound on the lifetime, so a provider sending Cache-Control: no-cache
+# or max-age=0 does not cost a round trip on every validation. Rotated keys
+# are still picked up through the unknown kid refetch.
+_MIN_JWKS_CACHE_TTL = 60
+
+# Keys are refreshed in the background once 80% of their lifetime has passed,
+# so validation does not wait on the provider when an entry expires.
+_jwks_cache = HttpResponseCache(
+    default_ttl=_DEFAULT_JWKS_CACHE_TTL,
+    min_ttl=_MIN_JWKS_CACHE_TTL,
+    refresh_ahead=0.8,
+)
+
+
+@dataclass(slots=True)
 class JwksRequest:
     address: str
 
 
-@dataclass
+# Responses are shared through the JWKS cache, so keys and responses are
+# immutable and callers cannot change what later validations see.
+@dataclass(slots=True, frozen=True)
 class JsonWebKey:
     kty: str
     use: str
@@ -17,7 +42,7 @@ class JsonWebKey:
     n: str
     e: str
     x5t: str = None
-    x5c: List[str] = None
+    x5c: Optional[Tuple[str, ...]] = None
     issuer: Optional[str] = None
     alg: Optional[str] = None
 
@@ -29,52 +54,116 @@ class JsonWebKey:
             "x5t": self.x5t,
             "n": self.n,
             "e": self.e,
-            "x5c": self.x5c,
+            "x5c": list(self.x5c) if self.x5c is not None else None,
             "issuer": self.issuer,
             "alg": self.alg,
         }
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class JwksResponse:
     is_successful: bool
-    keys: Optional[List[JsonWebKey]] = None
+    keys: Optional[Tuple[JsonWebKey, ...]] = None
     error: Optional[str] = None
+    keys_by_kid: Mapping[Optional[str], JsonWebKey] = field(
+        init=False, repr=False, compare=False
+    )
+
+    def __post_init__(self):
+        if self.keys is not None:
+            object.__setattr__(self, "keys", tuple(self.keys))
+
+        # Built once per response so key lookups during validation are a
+        # dict hit. The first key wins when a JWKS repeats a kid.
+        keys_by_kid = {}
+        for key in self.keys or ():
+            keys_by_kid.setdefault(key.kid, key)
+        object.__setattr__(self, "keys_by_kid", MappingProxyType(keys_by_kid))
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
 
 
 def jwks_from_dict(keys_dict: dict) -> JsonWebKey:
+    get = keys_dict.get
+    x5c = get("x5c")
+    # kty, use and alg come from a tiny vocabulary ("RSA", "sig", "RS256"),
+    # so interning them shares one string object across every cached key.
     return JsonWebKey(
-        kty=keys_dict.get("kty"),
-        use=keys_dict.get("use"),
-        kid=keys_dict.get("kid"),
-        x5c=keys_dict.get("x5c"),
-        x5t=keys_dict.get("x5t"),
-        n=keys_dict.get("n"),
-        e=keys_dict.get("e"),
-        issuer=keys_dict.get("issuer"),
-        alg=keys_dict.get("alg"),
+        kty=_intern(get("kty")),
+        use=_intern(get("use")),
+        kid=get("kid"),
+        x5c=tuple(x5c) if x5c is not None else None,
+        x5t=get("x5t"),
+        n=get("n"),
+        e=get("e"),
+        issuer=get("issuer"),
+        alg=_intern(get("alg")),
     )
 
 
+def _is_jwks_cached(address: str) -> bool:
+    return _jwks_cache.get(address) is not None
+
+
+def _invalidate_jwks(address: str) -> None:
+    _jwks_cache.invalidate(address)
+
+
 def get_jwks(jwks_request: JwksRequest) -> JwksResponse:
+    address = jwks_request.address
+    cached = _jwks_cache.get(address)
+    if cached is not None:
+        if _jwks_cache.claim_refresh(address):
+            threading.Thread(
+                target=_fetch_jwks, args=(address, False), daemon=True
+            ).start()
+        return cached
+
+    return _fetch_jwks(address)
+
+
+def _fetch_jwks(address: str, serve_stale: bool = True) -> JwksResponse:
     try:
-        response = requests.get(jwks_request.address)
-        if response.ok:
-            response_json = response.json()
-            keys = [jwks_from_dict(key) for key in response_json["keys"]]
-            return JwksResponse(is_successful=True, keys=keys)
-        else:
-            return JwksResponse(
-                is_successful=False,
-                error=f"JSON web keys request failed with status code: "
-                f"{response.status_code}. Response Content: {response.content}",
-            )
+        with get_http_session().get(
+            address, headers=_jwks_cache.get_conditional_headers(address)
+        ) as response:
+            if response.status_code == 304:
+                jwks_response = _jwks_cache.revalidate(
+                    address, response.headers
+                )
+                if jwks_response is not None:
+                    return jwks_response
+
+            if response.ok and response.status_code != 304:
+                response_json = loads(response.content)
+                keys = tuple(
+                    jwks_from_dict(key) for key in response_json["keys"]
+                )
+                jwks_response = JwksResponse(is_successful=True, keys=keys)
+                _jwks_cache.store(address, jwks_response, response.headers)
+                return jwks_response
+            else:
+                error = (
+                    f"JSON web keys request failed with status code: "
+                    f"{response.status_code}. Response Content: {response.content}"
+                )
     except Exception as e:
+        error = f"Unhandled exception during JWKS request: {e}"
+
+    # Keep validating against the last known keys while the provider is
+    # unavailable. A failed background refresh leaves the still fresh entry
+    # alone, so it keeps its remaining lifetime and the refresh is retried.
+    if serve_stale:
+        stale_response = _jwks_cache.get_stale(address)
+        if stale_response is not None:
+            return stale_response
+
+    return JwksResponse(is_successful=False, error=error)
+
 
-        return JwksResponse(
-            is_successful=False,
-            error=f"Unhandled exception during JWKS request: {e}",
-        )
+get_jwks.cache_clear = _jwks_cache.clear
 
 
 __all__ = ["JwksRequest", "JwksResponse", "JsonWebKey", "get_jwks"]
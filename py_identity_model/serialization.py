@@ -0,0 +1,11 @@
+# orjson parses OIDC metadata and JWKS payloads several times faster than the
+# standard library and accepts the raw response bytes directly. It is an
+# optional dependency; both implementations raise a ValueError subclass on
+# malformed input, so callers can handle either the same way.
+try:
+    from orjson import loads
+except ImportError:  # pragma: no cover - depends on the environment
+    from json import loads
+
+
+__all__ = ["loads"]
@@ -1,10 +1,31 @@
-from dataclasses import dataclass
+import copy
+import hashlib
+import os
+from dataclasses import dataclass, replace
 from typing import Optional
 
-import requests
+from .cache import TTLCache
+from .http_client import get_http_session
+from .serialization import loads
 
+# requests merges these into a fresh header mapping per request, so sharing a
+# single dict across calls is safe.
+_TOKEN_REQUEST_HEADERS = {"Content-Type": "application/x-www-form-urlencoded"}
 
-@dataclass
+# Cached tokens are dropped this many seconds before they expire so callers
+# never receive a token that lapses while in flight.
+_TOKEN_EXPIRY_SKEW = 30
+
+# Token caching is on by default; set OIDC_TOKEN_CACHE_ENABLED=false to
+# request a new token on every call.
+_TOKEN_CACHE_ENABLED = os.environ.get(
+    "OIDC_TOKEN_CACHE_ENABLED", "true"
+).lower() in ("1", "true", "yes")
+
+_token_cache = TTLCache()
+
+
+@dataclass(slots=True)
 class ClientCredentialsTokenRequest:
     address: str
     client_id: str
@@ -12,37 +33,63 @@ class ClientCredentialsTokenRequest:
     scope: str
 
 
-@dataclass
+@dataclass(slots=True)
 class ClientCredentialsTokenResponse:
     is_successful: bool
     token: Optional[dict] = None
     error: Optional[str] = None
 
 
+def _copy_token_response(
+    token_response: ClientCredentialsTokenResponse,
+) -> ClientCredentialsTokenResponse:
+    return replace(token_response, token=copy.deepcopy(token_response.token))
+
+
 def request_client_credentials_token(
     request: ClientCredentialsTokenRequest,
 ) -> ClientCredentialsTokenResponse:
-    params = {"grant_type": "client_credentials", "scope": request.scope}
+    cache_key = (
+        request.address,
+        request.client_id,
+        hashlib.sha256(request.client_secret.encode()).digest(),
+        request.scope,
+    )
+    cached = _token_cache.get(cache_key) if _TOKEN_CACHE_ENABLED else None
+    if cached is not None:
+        return _copy_token_response(cached)
 
-    headers = {"Content-Type": "application/x-www-form-urlencoded"}
+    params = {"grant_type": "client_credentials", "scope": request.scope}
 
-    response = requests.post(
+    with get_http_session().post(
         request.address,
         data=params,
-        headers=headers,
+        headers=_TOKEN_REQUEST_HEADERS,
         auth=(request.client_id, request.client_secret),
-    )
+    ) as response:
+        if not response.ok:
+            return ClientCredentialsTokenResponse(
+                is_successful=False,
+                error=f"Token generation request failed with status code: "
+                f"{response.status_code}. Response Content: "
+                f"{response.content}",
+            )
 
-    if response.ok:
-        return ClientCredentialsTokenResponse(
-            is_successful=True, token=response.json()
+        token_response = ClientCredentialsTokenResponse(
+            is_successful=True, token=loads(response.content)
         )
-    else:
-        return ClientCredentialsTokenResponse(
-            is_successful=False,
-            error=f"Token generation request failed with status code: "
-            f"{response.status_code}. Response Content: {response.content}",
+
+    expires_in = token_response.token.get("expires_in")
+    if _TOKEN_CACHE_ENABLED and isinstance(expires_in, (int, float)):
+        _token_cache.set(
+            cache_key, token_response, expires_in - _TOKEN_EXPIRY_SKEW
         )
+        # Callers own the returned token, so never hand out the cached one.
+        return _copy_token_response(token_response)
+    return token_response
+
+
+request_client_credentials_token.cache_clear = _token_cache.clear
 
 
 __all__ = [
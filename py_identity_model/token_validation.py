@@ -1,19 +1,61 @@
-from dataclasses import dataclass
+import base64
+import copy
+import hashlib
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
 from functools import lru_cache
 from typing import List, Optional, Callable
 
 import jwt as jwt_utils
 from jwt import PyJWK
+from .cache import TTLCache
 from .discovery import (
+    _get_last_known_discovery_document,
+    _is_discovery_document_cached,
     get_discovery_document,
     DiscoveryDocumentRequest,
     DiscoveryDocumentResponse,
 )
 from .exceptions import PyIdentityModelException
-from .jwks import get_jwks, JwksRequest, JsonWebKey, JwksResponse
+from .jwks import (
+    _invalidate_jwks,
+    _is_jwks_cached,
+    get_jwks,
+    JwksRequest,
+    JsonWebKey,
+    JwksResponse,
+)
+from .serialization import loads
+
+# Minimum number of seconds between JWKS refetches triggered by an unknown
+# kid, so tokens carrying made-up kids cannot be used to flood the provider.
+_JWKS_REFRESH_COOLDOWN = 60
+
+_jwks_refreshes = TTLCache()
+
+# Opt-in cache of already verified claims, keyed by a hash of the token. An
+# entry never outlives the token's own exp claim.
+_VALIDATED_TOKEN_CACHE_ENABLED = os.environ.get(
+    "AUTH_CACHE_ENABLED", ""
+).lower() in ("1", "true", "yes")
+_VALIDATED_TOKEN_CACHE_TTL = int(os.environ.get("AUTH_CACHE_TTL", 30))
+
+_validated_token_cache = TTLCache(maxsize=10000)
+
+# Fetches a hinted JWKS while the discovery document is being retrieved.
+# Worker threads are only started once a hint is actually used.
+_jwks_prefetch_executor = ThreadPoolExecutor(
+    max_workers=4, thread_name_prefix="py-identity-model-jwks"
+)
+
+# Each hint is prefetched at most once per cooldown, so a hint that keeps
+# failing cannot queue up work on the executor.
+_jwks_prefetches = TTLCache()
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class TokenValidationConfig:
     perform_disco: bool
     key: Optional[dict] = None
@@ -25,26 +67,76 @@ class TokenValidationConfig:
     claims_validator: Optional[Callable] = None
 
 
-def _get_public_key_from_jwk(jwt: str, keys: List[JsonWebKey]) -> JsonWebKey:
-    # TODO: clean up flow to prevent multiple decodes
-    headers = jwt_utils.get_unverified_header(jwt)
-    filtered_keys = list(
-        filter(lambda x: x.kid == headers.get("kid", None), keys)
-    )
-    if not filtered_keys:
+def _decode_segment(segment: str) -> dict:
+    return loads(base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4)))
+
+
+@lru_cache(maxsize=4096)
+def _get_unverified_header(header_segment: str) -> dict:
+    # Keyed on the header segment alone, which is shared by every token
+    # signed with the same key. The returned dict is shared and must not be
+    # mutated.
+    try:
+        headers = _decode_segment(header_segment)
+    except ValueError as e:
+        raise jwt_utils.DecodeError("Invalid header string") from e
+
+    if not isinstance(headers, dict):
+        raise jwt_utils.DecodeError(
+            "Invalid header string: must be a json object"
+        )
+
+    if not isinstance(headers.get("kid", ""), str):
+        raise jwt_utils.InvalidTokenError(
+            "Key ID header parameter must be a string"
+        )
+
+    return headers
+
+
+def _get_public_key_from_jwk(
+    headers: dict, jwks_response: JwksResponse
+) -> JsonWebKey:
+    key = jwks_response.keys_by_kid.get(headers.get("kid", None))
+    if key is None:
         raise PyIdentityModelException("No matching kid found")
 
-    key = filtered_keys[0]
+    # The key is shared through the JWKS cache, so fill in a missing alg on
+    # a copy rather than on the cached instance.
     if not key.alg:
-        key.alg = headers["alg"]
+        key = replace(key, alg=headers["alg"])
 
     return key
 
 
+@lru_cache(maxsize=128)
+def _build_signing_key(
+    kty: str, kid: Optional[str], alg: str, n: str, e: str
+) -> PyJWK:
+    # Keyed on the key material rather than just the kid, so a provider that
+    # reuses a kid for a new key can never be served the old one.
+    return PyJWK({"kty": kty, "kid": kid, "alg": alg, "n": n, "e": e}, alg)
+
+
+def _get_signing_key(public_key: JsonWebKey) -> PyJWK:
+    return _build_signing_key(
+        public_key.kty,
+        public_key.kid,
+        public_key.alg,
+        public_key.n,
+        public_key.e,
+    )
+
+
 def _validate_token_config(
     token_validation_config: TokenValidationConfig,
+    disco_doc_address: Optional[str] = None,
 ) -> bool:
     if token_validation_config.perform_disco:
+        if not disco_doc_address:
+            raise PyIdentityModelException(
+                "disco_doc_address is required if TokenValidationConfig.perform_disco is True"
+            )
         return True
 
     if (
@@ -56,49 +148,204 @@ def _validate_token_config(
         )
 
 
-@lru_cache
+# Both lookups are served from the TTL caches in the discovery and jwks
+# modules, which honour Cache-Control, revalidate with ETag/Last-Modified and
+# fall back to the last known response when the provider is unreachable.
 def _get_disco_response(disco_doc_address: str) -> DiscoveryDocumentResponse:
     return get_discovery_document(
         DiscoveryDocumentRequest(address=disco_doc_address)
     )
 
 
-@lru_cache
 def _get_jwks_response(jwks_uri: str) -> JwksResponse:
     return get_jwks(JwksRequest(address=jwks_uri))
 
 
-def validate_token(
+def _refresh_jwks_response(jwks_uri: str) -> Optional[JwksResponse]:
+    # Claimed atomically, so concurrent tokens with an unknown kid trigger a
+    # single refetch between them.
+    if not _jwks_refreshes.add(jwks_uri, True, _JWKS_REFRESH_COOLDOWN):
+        return None
+
+    _invalidate_jwks(jwks_uri)
+    return _get_jwks_response(jwks_uri)
+
+
+def _should_prefetch_jwks(disco_doc_address: str, jwks_uri_hint: str) -> bool:
+    # Only a cold start has a discovery round trip to overlap with
+    if _is_discovery_document_cached(disco_doc_address):
+        return False
+
+    # A hint the provider is known not to use would be wasted work
+    last_known = _get_last_known_discovery_document(disco_doc_address)
+    if last_known is not None and last_known.jwks_uri != jwks_uri_hint:
+        return False
+
+    if _is_jwks_cached(jwks_uri_hint):
+        return False
+
+    return _jwks_prefetches.add(jwks_uri_hint, True, _JWKS_REFRESH_COOLDOWN)
+
+
+def _reject_expired_token(jwt: str, options: Optional[dict]) -> None:
+    # An expired token is rejected before the JWKS lookup and the signature
+    # check. The claims are unverified here, but this can only ever turn a
+    # token away; jwt.decode remains the authority for accepting one.
+    options = options or {}
+    verify_exp = options.get(
+        "verify_exp", options.get("verify_signature", True)
+    )
+    if not verify_exp:
+        return
+
+    try:
+        expires_at = _decode_segment(jwt.split(".")[1]).get("exp")
+    except (IndexError, ValueError, TypeError, AttributeError):
+        # Malformed tokens are left for jwt.decode to report
+        return
+
+    if isinstance(expires_at, bool) or not isinstance(
+        expires_at, (int, float)
+    ):
+        return
+
+    # jwt.decode is called without a leeway, so none is applied here either
+    if expires_at <= time.time():
+        raise jwt_utils.ExpiredSignatureError("Signature has expired")
+
+
+def _get_validated_token_cache_key(
     jwt: str,
     token_validation_config: TokenValidationConfig,
-    disco_doc_address: str = None,
+    disco_doc_address: Optional[str],
+) -> tuple:
+    # With discovery enabled the key and algorithms are resolved from the
+    # JWKS on every call, so they are not part of what the caller configured.
+    key, algorithms = None, None
+    if not token_validation_config.perform_disco:
+        key = token_validation_config.key
+        algorithms = token_validation_config.algorithms
+
+    config_fingerprint = repr(
+        (
+            token_validation_config.perform_disco,
+            key,
+            algorithms,
+            token_validation_config.audience,
+            token_validation_config.issuer,
+            token_validation_config.subject,
+            token_validation_config.options,
+        )
+    )
+    return (
+        hashlib.sha256(jwt.encode()).digest(),
+        disco_doc_address,
+        config_fingerprint,
+    )
+
+
+def _decode_token(
+    jwt: str,
+    token_validation_config: TokenValidationConfig,
+    disco_doc_address: Optional[str],
+    jwks_uri_hint: Optional[str] = None,
 ) -> dict:
-    _validate_token_config(token_validation_config)
+    _validate_token_config(token_validation_config, disco_doc_address)
+    _reject_expired_token(jwt, token_validation_config.options)
 
     if token_validation_config.perform_disco:
+        # Parsed once up front, so a malformed token is rejected before any
+        # network round trip and the kid lookup below can be retried after
+        # a JWKS refresh without re-parsing.
+        headers = _get_unverified_header(jwt.split(".", 1)[0])
+
+        # On a cold cache, fetch the hinted JWKS alongside the discovery
+        # document instead of waiting for it to name the jwks_uri.
+        jwks_prefetch = None
+        if jwks_uri_hint and _should_prefetch_jwks(
+            disco_doc_address, jwks_uri_hint
+        ):
+            jwks_prefetch = _jwks_prefetch_executor.submit(
+                _get_jwks_response, jwks_uri_hint
+            )
+
         disco_doc_response = _get_disco_response(disco_doc_address)
 
         if not disco_doc_response.is_successful:
             raise PyIdentityModelException(disco_doc_response.error)
 
-        jwks_response = _get_jwks_response(disco_doc_response.jwks_uri)
+        if (
+            jwks_prefetch is not None
+            and disco_doc_response.jwks_uri == jwks_uri_hint
+        ):
+            jwks_response = jwks_prefetch.result()
+        else:
+            jwks_response = _get_jwks_response(disco_doc_response.jwks_uri)
         if not jwks_response.is_successful:
             raise PyIdentityModelException(jwks_response.error)
 
-        token_validation_config.key = _get_public_key_from_jwk(
-            jwt, jwks_response.keys
-        ).as_dict()
-        token_validation_config.algorithms = token_validation_config.key["alg"]
+        try:
+            public_key = _get_public_key_from_jwk(headers, jwks_response)
+        except PyIdentityModelException:
+            # The provider may have rotated its signing keys since the JWKS
+            # was cached, so refetch once before rejecting the token.
+            jwks_response = _refresh_jwks_response(disco_doc_response.jwks_uri)
+            if not jwks_response or not jwks_response.is_successful:
+                raise
+            public_key = _get_public_key_from_jwk(headers, jwks_response)
+
+        # Resolved per call rather than written back to the config, so one
+        # config can be shared between threads and requests.
+        signing_key = _get_signing_key(public_key)
+        algorithms = [public_key.alg]
+    else:
+        signing_key = PyJWK(
+            token_validation_config.key, token_validation_config.algorithms
+        )
+        algorithms = token_validation_config.algorithms
 
     decoded_token = jwt_utils.decode(
         jwt,
-        PyJWK(token_validation_config.key, token_validation_config.algorithms),
+        signing_key,
         audience=token_validation_config.audience,
-        algorithms=token_validation_config.algorithms,
+        algorithms=algorithms,
         issuer=token_validation_config.issuer,
         options=token_validation_config.options,
     )
 
+    return decoded_token
+
+
+def validate_token(
+    jwt: str,
+    token_validation_config: TokenValidationConfig,
+    disco_doc_address: str = None,
+    jwks_uri_hint: Optional[str] = None,
+) -> dict:
+    if not _VALIDATED_TOKEN_CACHE_ENABLED:
+        decoded_token = _decode_token(
+            jwt, token_validation_config, disco_doc_address, jwks_uri_hint
+        )
+    else:
+        cache_key = _get_validated_token_cache_key(
+            jwt, token_validation_config, disco_doc_address
+        )
+        decoded_token = _validated_token_cache.get(cache_key)
+        if decoded_token is None:
+            decoded_token = _decode_token(
+                jwt, token_validation_config, disco_doc_address, jwks_uri_hint
+            )
+            ttl = _VALIDATED_TOKEN_CACHE_TTL
+            expires_at = decoded_token.get("exp")
+            if isinstance(expires_at, (int, float)):
+                ttl = min(ttl, expires_at - time.time())
+            _validated_token_cache.set(cache_key, decoded_token, ttl)
+
+        # Callers own the returned claims, so never hand out the cached dict.
+        decoded_token = copy.deepcopy(decoded_token)
+
+    # The claims validator runs on every call, cached or not, so custom
+    # checks keep their semantics.
     if token_validation_config.claims_validator:
         token_validation_config.claims_validator(decoded_token)
 
@@ -0,0 +1,54 @@
+import pytest
+
+from py_identity_model import (
+    ClientCredentialsTokenRequest,
+    ClientCredentialsTokenResponse,
+    DiscoveryDocumentRequest,
+    get_discovery_document,
+    request_client_credentials_token,
+)
+from py_identity_model.token_validation import (
+    _get_disco_response,
+    _get_jwks_response,
+)
+from .test_utils import get_config
+
+
+@pytest.fixture(scope="session")
+def test_config() -> dict:
+    return get_config()
+
+
+@pytest.fixture(scope="session")
+def token_endpoint(test_config) -> str:
+    disco_doc_response = get_discovery_document(
+        DiscoveryDocumentRequest(address=test_config["TEST_DISCO_ADDRESS"])
+    )
+    assert disco_doc_response.is_successful
+    return disco_doc_response.token_endpoint
+
+
+@pytest.fixture(scope="session")
+def client_credentials_token(
+    test_config, token_endpoint
+) -> ClientCredentialsTokenResponse:
+    client_creds_response = request_client_credentials_token(
+        ClientCredentialsTokenRequest(
+            client_id=test_config["TEST_CLIENT_ID"],
+            client_secret=test_config["TEST_CLIENT_SECRET"],
+            address=token_endpoint,
+            scope=test_config["TEST_SCOPE"],
+        )
+    )
+    assert client_creds_response.is_successful
+    return client_creds_response
+
+
+# Function scoped because other tests clear the caches. Once the caches are
+# warm this is two in-process lookups, so timed tests measure the cached
+# validation path rather than a first fetch.
+@pytest.fixture
+def warm_validation_caches(test_config) -> None:
+    disco_doc_response = _get_disco_response(test_config["TEST_DISCO_ADDRESS"])
+    assert disco_doc_response.is_successful
+    assert _get_jwks_response(disco_doc_response.jwks_uri).is_successful
@@ -0,0 +1,57 @@
+import asyncio
+
+from py_identity_model import (
+    ClientCredentialsTokenRequest,
+    DiscoveryDocumentRequest,
+    JwksRequest,
+    TokenValidationConfig,
+    aio,
+)
+from .test_utils import get_config
+
+config = get_config()
+TEST_DISCO_ADDRESS = config["TEST_DISCO_ADDRESS"]
+TEST_JWKS_ADDRESS = config["TEST_JWKS_ADDRESS"]
+TEST_CLIENT_ID = config["TEST_CLIENT_ID"]
+TEST_CLIENT_SECRET = config["TEST_CLIENT_SECRET"]
+TEST_SCOPE = config["TEST_SCOPE"]
+TEST_AUDIENCE = config["TEST_AUDIENCE"]
+
+
+def test_get_discovery_document_and_jwks_concurrently():
+    async def fetch():
+        return await asyncio.gather(
+            aio.get_discovery_document(
+                DiscoveryDocumentRequest(address=TEST_DISCO_ADDRESS)
+            ),
+            aio.get_jwks(JwksRequest(address=TEST_JWKS_ADDRESS)),
+        )
+
+    disco_doc_response, jwks_response = asyncio.run(fetch())
+    assert disco_doc_response.is_successful
+    assert jwks_response.is_successful
+
+
+def test_request_token_and_validate():
+    async def request_and_validate():
+        disco_doc_response = await aio.get_discovery_document(
+            DiscoveryDocumentRequest(address=TEST_DISCO_ADDRESS)
+        )
+        client_creds_response = await aio.request_client_credentials_token(
+            ClientCredentialsTokenRequest(
+                client_id=TEST_CLIENT_ID,
+                client_secret=TEST_CLIENT_SECRET,
+                address=disco_doc_response.token_endpoint,
+                scope=TEST_SCOPE,
+            )
+        )
+        return await aio.validate_token(
+            jwt=client_creds_response.token["access_token"],
+            disco_doc_address=TEST_DISCO_ADDRESS,
+            token_validation_config=TokenValidationConfig(
+                perform_disco=True, audience=TEST_AUDIENCE
+            ),
+        )
+
+    claims = asyncio.run(request_and_validate())
+    assert claims["iss"]
@@ -0,0 +1,171 @@
+import threading
+import time
+
+import pytest
+
+from py_identity_model import discovery, jwks
+from py_identity_model.cache import HttpResponseCache, TTLCache, get_max_age
+
+
+def test_ttl_cache_returns_value_before_expiry():
+    cache = TTLCache()
+    cache.set("key", "value", ttl=60)
+    assert cache.get("key") == "value"
+
+
+def test_ttl_cache_expires_entries(monkeypatch):
+    cache = TTLCache()
+    cache.set("key", "value", ttl=60)
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now + 61)
+    assert cache.get("key") is None
+    assert len(cache) == 0
+
+
+def test_ttl_cache_does_not_store_non_positive_ttl():
+    cache = TTLCache()
+    cache.set("key", "value", ttl=0)
+    assert cache.get("key") is None
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2)
+    cache.set("a", 1, ttl=60)
+    cache.set("b", 2, ttl=60)
+    cache.get("a")
+    cache.set("c", 3, ttl=60)
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+
+def test_ttl_cache_add_only_stores_missing_keys(monkeypatch):
+    cache = TTLCache()
+    assert cache.add("key", "first", ttl=60) is True
+    assert cache.add("key", "second", ttl=60) is False
+    assert cache.get("key") == "first"
+
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now + 61)
+    assert cache.add("key", "third", ttl=60) is True
+    assert cache.get("key") == "third"
+
+
+def test_ttl_cache_add_succeeds_once_across_threads():
+    cache = TTLCache()
+    barrier = threading.Barrier(8)
+    results = []
+
+    def add():
+        barrier.wait()
+        results.append(cache.add("key", True, ttl=60))
+
+    threads = [threading.Thread(target=add) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results.count(True) == 1
+
+
+def test_get_max_age():
+    assert get_max_age({}) is None
+    assert get_max_age({"Cache-Control": "public"}) is None
+    assert get_max_age({"Cache-Control": "public, max-age=300"}) == 300
+    assert get_max_age({"Cache-Control": "no-store"}) == 0
+    assert get_max_age({"Cache-Control": "no-cache, max-age=300"}) == 0
+
+
+def test_http_response_cache_uses_max_age_with_floor():
+    cache = HttpResponseCache(default_ttl=60, min_ttl=10)
+    cache.store("key", "value", {"Cache-Control": "max-age=0"})
+    assert cache.get("key") == "value"
+
+
+def test_http_response_cache_sends_validators_once_stale(monkeypatch):
+    cache = HttpResponseCache(default_ttl=60)
+    cache.store(
+        "key",
+        "value",
+        {"ETag": '"v1"', "Last-Modified": "Wed, 21 Oct 2015 07:28:00 GMT"},
+    )
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now + 61)
+
+    assert cache.get("key") is None
+    assert cache.get_conditional_headers("key") == {
+        "If-None-Match": '"v1"',
+        "If-Modified-Since": "Wed, 21 Oct 2015 07:28:00 GMT",
+    }
+    assert cache.revalidate("key", {}) == "value"
+    assert cache.get("key") == "value"
+
+
+def test_http_response_cache_serves_stale_after_failure():
+    cache = HttpResponseCache(default_ttl=60)
+    assert cache.get_stale("key") is None
+
+    cache.store("key", "value", {})
+    cache.invalidate("key")
+    assert cache.get("key") is None
+    assert cache.get_stale("key") == "value"
+    assert cache.get("key") == "value"
+
+
+def test_http_response_cache_claims_refresh_once(monkeypatch):
+    cache = HttpResponseCache(
+        default_ttl=100, stale_if_error_ttl=10, refresh_ahead=0.8
+    )
+    cache.store("key", "value", {})
+    assert cache.claim_refresh("key") is False
+
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now + 81)
+    assert cache.get("key") == "value"
+    assert cache.claim_refresh("key") is True
+    assert cache.claim_refresh("key") is False
+
+
+def test_http_response_cache_does_not_keep_no_store_responses():
+    cache = HttpResponseCache(default_ttl=60, min_ttl=10)
+    cache.store("key", "value", {"Cache-Control": "no-store"})
+    assert cache.get("key") == "value"
+
+    cache.invalidate("key")
+    assert cache.get_stale("key") is None
+    assert cache.get_conditional_headers("key") == {}
+
+
+@pytest.mark.parametrize(
+    "response_cache", [discovery._disco_cache, jwks._jwks_cache]
+)
+@pytest.mark.parametrize("cache_control", ["no-cache", "max-age=0"])
+def test_module_caches_keep_uncacheable_responses_for_a_floor(
+    response_cache, cache_control
+):
+    key = "https://example.com/uncacheable"
+    try:
+        response_cache.store(key, "value", {"Cache-Control": cache_control})
+        assert response_cache.get(key) == "value"
+    finally:
+        response_cache.invalidate(key)
+
+
+def test_http_response_cache_reclaims_refresh_after_failure(monkeypatch):
+    cache = HttpResponseCache(
+        default_ttl=1000, stale_if_error_ttl=10, refresh_ahead=0.8
+    )
+    cache.store("key", "value", {"Cache-Control": "max-age=1000"})
+    now = time.monotonic()
+
+    monkeypatch.setattr(time, "monotonic", lambda: now + 801)
+    assert cache.claim_refresh("key") is True
+    # The refresh fails, so nothing is stored
+
+    monkeypatch.setattr(time, "monotonic", lambda: now + 805)
+    assert cache.claim_refresh("key") is False
+
+    monkeypatch.setattr(time, "monotonic", lambda: now + 812)
+    assert cache.get("key") == "value"
+    assert cache.claim_refresh("key") is True
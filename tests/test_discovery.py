@@ -1,4 +1,8 @@
-from py_identity_model import DiscoveryDocumentRequest, get_discovery_document
+from py_identity_model import (
+    DiscoveryDocumentRequest,
+    get_discovery_document,
+    get_discovery_documents,
+)
 from .test_utils import get_config
 
 TEST_DISCO_ADDRESS = get_config()["TEST_DISCO_ADDRESS"]
@@ -18,3 +22,37 @@ def test_get_discovery_document_fails():
     disco_doc_request = DiscoveryDocumentRequest(address="https://google.com")
     disco_doc_response = get_discovery_document(disco_doc_request)
     assert disco_doc_response.is_successful is False
+
+
+def test_get_discovery_document_is_cached():
+    get_discovery_document.cache_clear()
+    disco_doc_request = DiscoveryDocumentRequest(address=TEST_DISCO_ADDRESS)
+    first_response = get_discovery_document(disco_doc_request)
+    second_response = get_discovery_document(disco_doc_request)
+    assert first_response.is_successful
+    assert second_response is first_response
+
+
+def test_get_discovery_documents_preserves_order():
+    disco_doc_responses = get_discovery_documents(
+        [
+            DiscoveryDocumentRequest(address=TEST_DISCO_ADDRESS),
+            DiscoveryDocumentRequest(address="https://google.com"),
+        ]
+    )
+    assert len(disco_doc_responses) == 2
+    assert disco_doc_responses[0].is_successful
+    assert disco_doc_responses[1].is_successful is False
+
+
+def test_get_discovery_documents_reports_unreachable_issuers():
+    disco_doc_responses = get_discovery_documents(
+        [
+            DiscoveryDocumentRequest(address="https://nonexistent.invalid"),
+            DiscoveryDocumentRequest(address=TEST_DISCO_ADDRESS),
+        ]
+    )
+    assert len(disco_doc_responses) == 2
+    assert disco_doc_responses[0].is_successful is False
+    assert disco_doc_responses[0].error
+    assert disco_doc_responses[1].is_successful
@@ -0,0 +1,35 @@
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3 import HTTPResponse
+
+from py_identity_model import get_http_session
+from py_identity_model import http_client
+
+
+def test_get_http_session_is_shared():
+    assert get_http_session() is get_http_session()
+
+
+def test_retry_after_is_capped():
+    retry = get_http_session().get_adapter("https://").max_retries
+    response = HTTPResponse(headers={"Retry-After": "3600"}, status=503)
+    assert retry.get_retry_after(response) == http_client._MAX_RETRY_AFTER
+    assert retry.new(total=1).get_retry_after(response) == (
+        http_client._MAX_RETRY_AFTER
+    )
+
+
+def test_requests_get_a_default_timeout(monkeypatch):
+    timeouts = []
+
+    def send(self, request, timeout=None, **kwargs):
+        timeouts.append(timeout)
+
+    monkeypatch.setattr(HTTPAdapter, "send", send)
+    adapter = get_http_session().get_adapter("https://")
+    request = requests.Request("GET", "https://example.com").prepare()
+
+    adapter.send(request)
+    adapter.send(request, timeout=1)
+
+    assert timeouts == [http_client._DEFAULT_TIMEOUT, 1]
@@ -1,6 +1,9 @@
+import dataclasses
 import os
 
-from py_identity_model import JwksRequest, get_jwks
+import pytest
+
+from py_identity_model import JwksRequest, JwksResponse, get_jwks, jwks
 from .test_utils import get_config
 
 TEST_JWKS_ADDRESS = get_config()["TEST_JWKS_ADDRESS"]
@@ -26,3 +29,61 @@ def test_get_jwks_fails():
     jwks_request = JwksRequest(address="https://google.com")
     jwks_response = get_jwks(jwks_request)
     assert jwks_response.is_successful is False
+
+
+def test_get_jwks_is_cached():
+    get_jwks.cache_clear()
+    jwks_request = JwksRequest(address=TEST_JWKS_ADDRESS)
+    first_response = get_jwks(jwks_request)
+    second_response = get_jwks(jwks_request)
+    assert first_response.is_successful
+    assert second_response is first_response
+
+
+def test_get_jwks_indexes_keys_by_kid():
+    jwks_request = JwksRequest(address=TEST_JWKS_ADDRESS)
+    jwks_response = get_jwks(jwks_request)
+    assert jwks_response.is_successful
+    for key in jwks_response.keys:
+        assert jwks_response.keys_by_kid[key.kid] is key
+
+
+def test_cached_jwks_cannot_be_modified():
+    jwks_response = JwksResponse(
+        is_successful=True,
+        keys=[
+            jwks.jwks_from_dict(
+                {"kty": "RSA", "kid": "a", "n": "n", "e": "e", "x5c": ["c"]}
+            )
+        ],
+    )
+    key = jwks_response.keys[0]
+
+    assert isinstance(jwks_response.keys, tuple)
+    assert isinstance(key.x5c, tuple)
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        key.alg = "RS256"
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        jwks_response.keys = ()
+    with pytest.raises(TypeError):
+        jwks_response.keys_by_kid["b"] = key
+
+
+def test_failed_background_refresh_keeps_fresh_keys(monkeypatch):
+    address = "https://idp.example.com/failing-refresh/jwks"
+    cached_response = JwksResponse(is_successful=True, keys=[])
+    jwks._jwks_cache.store(
+        address, cached_response, {"Cache-Control": "max-age=1000"}
+    )
+
+    def get_failing_session():
+        raise OSError("provider unavailable")
+
+    monkeypatch.setattr(jwks, "get_http_session", get_failing_session)
+    try:
+        refresh_response = jwks._fetch_jwks(address, serve_stale=False)
+
+        assert refresh_response.is_successful is False
+        assert jwks._jwks_cache.get(address) is cached_response
+    finally:
+        jwks._jwks_cache.invalidate(address)
@@ -0,0 +1,14 @@
+import pytest
+
+from py_identity_model.serialization import loads
+
+
+def test_loads_accepts_bytes():
+    assert loads(b'{"issuer": "https://example.com"}') == {
+        "issuer": "https://example.com"
+    }
+
+
+def test_loads_raises_value_error_on_malformed_input():
+    with pytest.raises(ValueError):
+        loads(b"<html></html>")
@@ -3,28 +3,22 @@ import os
 from py_identity_model import (
     ClientCredentialsTokenRequest,
     request_client_credentials_token,
-    get_discovery_document,
-    DiscoveryDocumentRequest,
 )
+from py_identity_model import token_client
 from .test_utils import get_config
 
 config = get_config()
-TEST_DISCO_ADDRESS = config["TEST_DISCO_ADDRESS"]
 TEST_CLIENT_ID = config["TEST_CLIENT_ID"]
 TEST_CLIENT_SECRET = config["TEST_CLIENT_SECRET"]
 TEST_SCOPE = config["TEST_SCOPE"]
 
 
 # TODO: failure conditions
-def test_request_client_credentials_token_is_successful():
-    disco_doc_response = get_discovery_document(
-        DiscoveryDocumentRequest(address=TEST_DISCO_ADDRESS)
-    )
-
+def test_request_client_credentials_token_is_successful(token_endpoint):
     client_creds_req = ClientCredentialsTokenRequest(
         client_id=TEST_CLIENT_ID,
         client_secret=TEST_CLIENT_SECRET,
-        address=disco_doc_response.token_endpoint,
+        address=token_endpoint,
         scope=TEST_SCOPE,
     )
     client_creds_token = request_client_credentials_token(client_creds_req)
@@ -34,15 +28,11 @@ def test_request_client_credentials_token_is_successful():
     assert client_creds_token.token
 
 
-def test_request_client_credentials_token_fails():
-    disco_doc_response = get_discovery_document(
-        DiscoveryDocumentRequest(address=TEST_DISCO_ADDRESS)
-    )
-
+def test_request_client_credentials_token_fails(token_endpoint):
     client_creds_req = ClientCredentialsTokenRequest(
         client_id="bad_client_id",
         client_secret="bad_client_secret",
-        address=disco_doc_response.token_endpoint,
+        address=token_endpoint,
         scope=TEST_SCOPE,
     )
     client_creds_token = request_client_credentials_token(client_creds_req)
@@ -51,3 +41,38 @@ def test_request_client_credentials_token_fails():
     assert client_creds_token.is_successful is False
     print(client_creds_token.error)
     assert client_creds_token.error
+
+
+def test_request_client_credentials_token_is_cached(token_endpoint):
+    request_client_credentials_token.cache_clear()
+    client_creds_req = ClientCredentialsTokenRequest(
+        client_id=TEST_CLIENT_ID,
+        client_secret=TEST_CLIENT_SECRET,
+        address=token_endpoint,
+        scope=TEST_SCOPE,
+    )
+    first_token = request_client_credentials_token(client_creds_req)
+    access_token = first_token.token["access_token"]
+    first_token.token["access_token"] = "tampered"
+    second_token = request_client_credentials_token(client_creds_req)
+
+    assert first_token.is_successful
+    assert second_token is not first_token
+    assert second_token.token["access_token"] == access_token
+
+
+def test_request_client_credentials_token_cache_can_be_disabled(
+    monkeypatch, token_endpoint
+):
+    monkeypatch.setattr(token_client, "_TOKEN_CACHE_ENABLED", False)
+    request_client_credentials_token.cache_clear()
+    client_creds_req = ClientCredentialsTokenRequest(
+        client_id=TEST_CLIENT_ID,
+        client_secret=TEST_CLIENT_SECRET,
+        address=token_endpoint,
+        scope=TEST_SCOPE,
+    )
+    client_creds_token = request_client_credentials_token(client_creds_req)
+
+    assert client_creds_token.is_successful
+    assert len(token_client._token_cache) == 0
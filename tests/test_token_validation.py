@@ -1,20 +1,29 @@
 import datetime
+import json
+import threading
+import time
 
 import pytest
+import jwt as jwt_utils
+from cryptography.hazmat.primitives.asymmetric import rsa
 from jwt import ExpiredSignatureError
+from jwt.algorithms import RSAAlgorithm
 
 from py_identity_model import (
     PyIdentityModelException,
     validate_token,
     get_discovery_document,
     DiscoveryDocumentRequest,
-    ClientCredentialsTokenRequest,
-    request_client_credentials_token,
     TokenValidationConfig,
 )
+from py_identity_model import discovery, jwks, token_validation
+from py_identity_model.cache import TTLCache
+from py_identity_model.discovery import DiscoveryDocumentResponse
+from py_identity_model.jwks import JwksResponse, jwks_from_dict
 from py_identity_model.token_validation import (
     _get_disco_response,
     _get_jwks_response,
+    _reject_expired_token,
 )
 from .test_utils import get_config
 
@@ -22,9 +31,6 @@ from .test_utils import get_config
 config = get_config()
 TEST_DISCO_ADDRESS = config["TEST_DISCO_ADDRESS"]
 TEST_EXPIRED_TOKEN = config["TEST_EXPIRED_TOKEN"]
-TEST_CLIENT_ID = config["TEST_CLIENT_ID"]
-TEST_CLIENT_SECRET = config["TEST_CLIENT_SECRET"]
-TEST_SCOPE = config["TEST_SCOPE"]
 TEST_AUDIENCE = config["TEST_AUDIENCE"]
 
 DEFAULT_OPTIONS = {
@@ -49,18 +55,208 @@ DEFAULT_OPTIONS = {
 }
 
 
-def _generate_token():
-    disco_doc_response = get_discovery_document(
-        DiscoveryDocumentRequest(address=TEST_DISCO_ADDRESS)
+def _encode_offline_token(claims: dict) -> str:
+    return jwt_utils.encode(
+        claims, "offline-test-secret-of-at-least-32-bytes", algorithm="HS256"
     )
-    client_creds_req = ClientCredentialsTokenRequest(
-        client_id=TEST_CLIENT_ID,
-        client_secret=TEST_CLIENT_SECRET,
-        address=disco_doc_response.token_endpoint,
-        scope=TEST_SCOPE,
+
+
+def test_reject_expired_token_throws_exception():
+    with pytest.raises(ExpiredSignatureError):
+        _reject_expired_token(
+            _encode_offline_token({"exp": int(time.time()) - 60}),
+            DEFAULT_OPTIONS,
+        )
+
+
+def test_reject_expired_token_skips_when_verify_exp_disabled():
+    _reject_expired_token(
+        _encode_offline_token({"exp": int(time.time()) - 60}),
+        {"verify_signature": True, "verify_exp": False},
+    )
+
+
+def test_reject_expired_token_skips_when_verify_signature_disabled():
+    _reject_expired_token(
+        _encode_offline_token({"exp": int(time.time()) - 60}),
+        {"verify_signature": False},
+    )
+
+
+def test_reject_expired_token_ignores_leeway_option():
+    options = {"verify_signature": True, "leeway": datetime.timedelta(60)}
+    _reject_expired_token(
+        _encode_offline_token({"exp": int(time.time()) + 60}), options
+    )
+    with pytest.raises(ExpiredSignatureError):
+        _reject_expired_token(
+            _encode_offline_token({"exp": int(time.time()) - 1}), options
+        )
+
+
+def test_reject_expired_token_leaves_malformed_tokens_to_decode():
+    _reject_expired_token("header.not-a-payload.signature", DEFAULT_OPTIONS)
+    _reject_expired_token("not-a-jwt", DEFAULT_OPTIONS)
+    _reject_expired_token(
+        _encode_offline_token({"exp": "tomorrow"}), DEFAULT_OPTIONS
+    )
+
+
+def test_unknown_kid_refetches_jwks_once(monkeypatch):
+    private_key = rsa.generate_private_key(
+        public_exponent=65537, key_size=2048
+    )
+    rotated_key = jwks_from_dict(
+        {
+            **json.loads(RSAAlgorithm.to_jwk(private_key.public_key())),
+            "kid": "rotated",
+            "use": "sig",
+            "alg": "RS256",
+        }
+    )
+    jwks_uri = "https://idp.example.com/jwks"
+    jwks_fetches = []
+
+    def get_jwks_response(uri):
+        # The first lookup serves a JWKS cached before the key rotation
+        jwks_fetches.append(uri)
+        keys = [rotated_key] if len(jwks_fetches) > 1 else []
+        return JwksResponse(is_successful=True, keys=keys)
+
+    monkeypatch.setattr(token_validation, "_jwks_refreshes", TTLCache())
+    monkeypatch.setattr(
+        token_validation,
+        "_get_disco_response",
+        lambda address: DiscoveryDocumentResponse(
+            is_successful=True, jwks_uri=jwks_uri
+        ),
+    )
+    monkeypatch.setattr(
+        token_validation, "_get_jwks_response", get_jwks_response
+    )
+    validation_config = TokenValidationConfig(
+        perform_disco=True, options={"verify_aud": False}
+    )
+
+    def encode(kid):
+        return jwt_utils.encode(
+            {"sub": "subject", "exp": int(time.time()) + 60},
+            private_key,
+            algorithm="RS256",
+            headers={"kid": kid},
+        )
+
+    claims = validate_token(
+        jwt=encode("rotated"),
+        disco_doc_address="https://idp.example.com",
+        token_validation_config=validation_config,
+    )
+    assert claims["sub"] == "subject"
+    assert len(jwks_fetches) == 2
+
+    # Within the cooldown, another unknown kid does not refetch again
+    with pytest.raises(PyIdentityModelException):
+        validate_token(
+            jwt=encode("unknown"),
+            disco_doc_address="https://idp.example.com",
+            token_validation_config=validation_config,
+        )
+    assert len(jwks_fetches) == 3
+
+
+def _record_jwks_prefetches(monkeypatch, jwks_uri, jwks_response):
+    prefetched_uris = []
+
+    def get_jwks_response(uri):
+        if threading.current_thread().name.startswith("py-identity-model"):
+            prefetched_uris.append(uri)
+        return jwks_response
+
+    monkeypatch.setattr(token_validation, "_jwks_prefetches", TTLCache())
+    monkeypatch.setattr(
+        token_validation,
+        "_get_disco_response",
+        lambda address: DiscoveryDocumentResponse(
+            is_successful=True, jwks_uri=jwks_uri
+        ),
+    )
+    monkeypatch.setattr(
+        token_validation, "_get_jwks_response", get_jwks_response
     )
-    client_creds_response = request_client_credentials_token(client_creds_req)
-    return client_creds_response
+    return prefetched_uris
+
+
+def test_failing_jwks_uri_hint_is_not_prefetched_repeatedly(monkeypatch):
+    jwks_uri = "https://failing-hint.example.com/jwks"
+    prefetched_uris = _record_jwks_prefetches(
+        monkeypatch,
+        jwks_uri,
+        JwksResponse(is_successful=False, error="provider unavailable"),
+    )
+    jwt = jwt_utils.encode(
+        {"exp": int(time.time()) + 60},
+        "offline-test-secret-of-at-least-32-bytes",
+        algorithm="HS256",
+        headers={"kid": "kid"},
+    )
+
+    for _ in range(5):
+        with pytest.raises(PyIdentityModelException):
+            validate_token(
+                jwt=jwt,
+                disco_doc_address="https://failing-hint.example.com",
+                token_validation_config=TokenValidationConfig(
+                    perform_disco=True, options={"verify_aud": False}
+                ),
+                jwks_uri_hint=jwks_uri,
+            )
+
+    assert prefetched_uris == [jwks_uri]
+
+
+def test_mismatched_jwks_uri_hint_is_not_prefetched(monkeypatch):
+    disco_doc_address = "https://mismatched-hint.example.com"
+    jwks_uri = "https://mismatched-hint.example.com/jwks"
+    private_key = rsa.generate_private_key(
+        public_exponent=65537, key_size=2048
+    )
+    signing_key = jwks_from_dict(
+        {
+            **json.loads(RSAAlgorithm.to_jwk(private_key.public_key())),
+            "kid": "current",
+            "use": "sig",
+            "alg": "RS256",
+        }
+    )
+    prefetched_uris = _record_jwks_prefetches(
+        monkeypatch,
+        jwks_uri,
+        JwksResponse(is_successful=True, keys=[signing_key]),
+    )
+    # A previously fetched, now expired, document names the real jwks_uri
+    discovery._disco_cache.store(
+        disco_doc_address,
+        DiscoveryDocumentResponse(is_successful=True, jwks_uri=jwks_uri),
+        {},
+    )
+    discovery._disco_cache.invalidate(disco_doc_address)
+
+    claims = validate_token(
+        jwt=jwt_utils.encode(
+            {"sub": "subject", "exp": int(time.time()) + 60},
+            private_key,
+            algorithm="RS256",
+            headers={"kid": "current"},
+        ),
+        disco_doc_address=disco_doc_address,
+        token_validation_config=TokenValidationConfig(
+            perform_disco=True, options={"verify_aud": False}
+        ),
+        jwks_uri_hint="https://mismatched-hint.example.com/old-jwks",
+    )
+
+    assert claims["sub"] == "subject"
+    assert prefetched_uris == []
 
 
 def test_token_validation_expired_token():
@@ -74,15 +270,13 @@ def test_token_validation_expired_token():
         )
 
 
-def test_token_validation_succeeds():
-    client_creds_response = _generate_token()
-
+def test_token_validation_succeeds(client_credentials_token):
     validation_config = TokenValidationConfig(
         perform_disco=True, audience=TEST_AUDIENCE, options=DEFAULT_OPTIONS
     )
 
     claims = validate_token(
-        jwt=client_creds_response.token["access_token"],
+        jwt=client_credentials_token.token["access_token"],
         disco_doc_address=TEST_DISCO_ADDRESS,
         token_validation_config=validation_config,
     )
@@ -92,67 +286,91 @@ def test_token_validation_succeeds():
     assert claims["exp"]
 
 
-def test_token_validation_with_invalid_config_throws_exception():
-    client_creds_response = _generate_token()
+def test_token_validation_without_disco_address_throws_exception():
+    validation_config = TokenValidationConfig(
+        perform_disco=True, audience=TEST_AUDIENCE, options=DEFAULT_OPTIONS
+    )
+
+    with pytest.raises(PyIdentityModelException):
+        validate_token(
+            jwt=TEST_EXPIRED_TOKEN,
+            token_validation_config=validation_config,
+        )
+
 
+def test_token_validation_with_invalid_config_throws_exception(
+    client_credentials_token,
+):
     validation_config = TokenValidationConfig(
         perform_disco=False, audience=TEST_AUDIENCE, options=DEFAULT_OPTIONS
     )
 
     with pytest.raises(PyIdentityModelException):
         validate_token(
-            jwt=client_creds_response.token["access_token"],
+            jwt=client_credentials_token.token["access_token"],
             disco_doc_address=TEST_DISCO_ADDRESS,
             token_validation_config=validation_config,
         )
 
 
-def test_cache_succeeds():
-    client_creds_response = _generate_token()
-
+def test_cache_succeeds(client_credentials_token):
     validation_config = TokenValidationConfig(
         perform_disco=True, audience=TEST_AUDIENCE, options=DEFAULT_OPTIONS
     )
 
     for i in range(0, 5):
         validate_token(
-            jwt=client_creds_response.token["access_token"],
+            jwt=client_credentials_token.token["access_token"],
             disco_doc_address=TEST_DISCO_ADDRESS,
             token_validation_config=validation_config,
         )
 
-    cache_info = _get_disco_response.cache_info()
-    print(cache_info)
-    assert cache_info
-    assert cache_info[0] > 0
+    disco_doc_response = _get_disco_response(TEST_DISCO_ADDRESS)
+    assert discovery._disco_cache.get(TEST_DISCO_ADDRESS) is disco_doc_response
 
-    cache_info = _get_jwks_response.cache_info()
-    print(cache_info)
-    assert cache_info
-    assert cache_info[0] > 0
+    jwks_response = _get_jwks_response(disco_doc_response.jwks_uri)
+    assert jwks._jwks_cache.get(disco_doc_response.jwks_uri) is jwks_response
 
 
-def test_benchmark_validation():
-    client_creds_response = _generate_token()
+def test_token_validation_with_jwks_uri_hint_succeeds(
+    client_credentials_token,
+):
+    disco_doc_response = _get_disco_response(TEST_DISCO_ADDRESS)
     validation_config = TokenValidationConfig(
         perform_disco=True, audience=TEST_AUDIENCE, options=DEFAULT_OPTIONS
     )
-    start_time = datetime.datetime.now()
+    jwks.get_jwks.cache_clear()
+
+    decoded_token = validate_token(
+        jwt=client_credentials_token.token["access_token"],
+        disco_doc_address=TEST_DISCO_ADDRESS,
+        token_validation_config=validation_config,
+        jwks_uri_hint=disco_doc_response.jwks_uri,
+    )
+
+    assert decoded_token
+    assert jwks._jwks_cache.get(disco_doc_response.jwks_uri)
+
+
+@pytest.mark.usefixtures("warm_validation_caches")
+def test_benchmark_validation(client_credentials_token):
+    validation_config = TokenValidationConfig(
+        perform_disco=True, audience=TEST_AUDIENCE, options=DEFAULT_OPTIONS
+    )
+    start_ns = time.perf_counter_ns()
 
     for i in range(0, 100):
         validate_token(
-            jwt=client_creds_response.token["access_token"],
+            jwt=client_credentials_token.token["access_token"],
             disco_doc_address=TEST_DISCO_ADDRESS,
             token_validation_config=validation_config,
         )
-    elapsed_time = datetime.datetime.now() - start_time
-    print(elapsed_time)
-    assert elapsed_time.total_seconds() < 1
-
+    elapsed_s = (time.perf_counter_ns() - start_ns) / 1e9
+    print(elapsed_s)
+    assert elapsed_s < 1
 
-def test_claim_validation_function_succeeds():
-    client_creds_response = _generate_token()
 
+def test_claim_validation_function_succeeds(client_credentials_token):
     def validate_claims(token: dict):
         # Do some token validation here
         # and raise an exception if the validation fails
@@ -166,7 +384,7 @@ def test_claim_validation_function_succeeds():
     )
 
     decoded_token = validate_token(
-        jwt=client_creds_response.token["access_token"],
+        jwt=client_credentials_token.token["access_token"],
         disco_doc_address=TEST_DISCO_ADDRESS,
         token_validation_config=validation_config,
     )
@@ -175,9 +393,7 @@ def test_claim_validation_function_succeeds():
     assert decoded_token["iss"]
 
 
-def test_claim_validation_function_fails():
-    client_creds_response = _generate_token()
-
+def test_claim_validation_function_fails(client_credentials_token):
     def validate_claims(token: dict):
         raise PyIdentityModelException("Validation failed!")
 
@@ -190,7 +406,33 @@ def test_claim_validation_function_fails():
 
     with pytest.raises(PyIdentityModelException):
         validate_token(
-            jwt=client_creds_response.token["access_token"],
+            jwt=client_credentials_token.token["access_token"],
             disco_doc_address=TEST_DISCO_ADDRESS,
             token_validation_config=validation_config,
         )
+
+
+def test_validated_token_cache_returns_copies(
+    monkeypatch, client_credentials_token
+):
+    monkeypatch.setattr(
+        token_validation, "_VALIDATED_TOKEN_CACHE_ENABLED", True
+    )
+    validation_config = TokenValidationConfig(
+        perform_disco=True, audience=TEST_AUDIENCE, options=DEFAULT_OPTIONS
+    )
+
+    first_claims = validate_token(
+        jwt=client_credentials_token.token["access_token"],
+        disco_doc_address=TEST_DISCO_ADDRESS,
+        token_validation_config=validation_config,
+    )
+    first_claims["iss"] = "tampered"
+    second_claims = validate_token(
+        jwt=client_credentials_token.token["access_token"],
+        disco_doc_address=TEST_DISCO_ADDRESS,
+        token_validation_config=validation_config,
+    )
+
+    assert second_claims["iss"] != "tampered"
+    assert len(token_validation._validated_token_cache) > 0